@@ -1,7 +1,13 @@
 import os
-import json
-import requests
-from params import DATA_PATH, ENDPOINTS, HEADERS
+import asyncio
+import httpx
+from params import (DATA_PATH, ENDPOINTS, HEADERS, MAX_CONCURRENT_REQUESTS,
+                    MIN_REQUEST_INTERVAL)
+from utils import cached_json_path, dump_json, json_loads, load_json
+
+# Persistent HTTP/2 client, to reuse the connection to the API between
+# requests
+CLIENT = httpx.Client(http2=True, headers=HEADERS, timeout=30.0)
 
 
 def get_json_response(url: str, headers: dict = HEADERS) -> dict:
@@ -21,8 +27,53 @@ def get_json_response(url: str, headers: dict = HEADERS) -> dict:
         Json with the response form the API
     """
 
-    response = requests.get(url, headers=headers)
-    r_dict = json.loads(response.text)
+    response = CLIENT.get(url, headers=headers)
+
+    return parse_json_response(response.content)
+
+
+async def get_json_response_async(client: httpx.AsyncClient, url: str,
+                                  headers: dict = HEADERS) -> dict:
+    """
+    Async version of get_json_response, sharing the connections of the given
+    client
+
+    Parameters
+    ----------
+    client : httpx.AsyncClient
+        Client used to send the request
+    url : str
+        url of the API to request with GET
+    headers : dict, default given
+        Header for the request
+
+    Returns
+    -------
+    r_dict : dict
+        Json with the response form the API
+    """
+
+    response = await client.get(url, headers=headers)
+
+    return parse_json_response(response.content)
+
+
+def parse_json_response(content: bytes) -> dict:
+    """
+    Transpose the body of an API response to dict/json
+
+    Parameters
+    ----------
+    content : bytes
+        Body of the response
+
+    Returns
+    -------
+    r_dict : dict
+        Json with the response form the API
+    """
+
+    r_dict = json_loads(content)
     # If key "api" is in response, then we have results
     if 'api' in r_dict:
         return r_dict
@@ -30,6 +81,49 @@ def get_json_response(url: str, headers: dict = HEADERS) -> dict:
         raise Exception(f"ERROR: {r_dict['message']}")
 
 
+class RateLimiter:
+    """
+    Async context manager limiting the requests to the API: at most
+    max_requests are sent at the same time, and two requests start at least
+    min_interval seconds apart.
+    """
+
+    def __init__(self, max_requests: int = MAX_CONCURRENT_REQUESTS,
+                 min_interval: float = MIN_REQUEST_INTERVAL):
+        """
+        Parameters
+        ----------
+        max_requests: int, default params.MAX_CONCURRENT_REQUESTS
+            Maximum number of requests sent at the same time
+        min_interval: float, default params.MIN_REQUEST_INTERVAL
+            Minimum interval in seconds between the start of two requests
+        """
+
+        self._semaphore = asyncio.Semaphore(max_requests)
+        self._lock = asyncio.Lock()
+        self._min_interval = min_interval
+        self._next_start = 0.
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            # Requests wait their turn one at a time
+            async with self._lock:
+                loop = asyncio.get_running_loop()
+                wait = self._next_start - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._next_start = loop.time() + self._min_interval
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+
 def output_json_response(json_input: dict, root_name: str,
                          output_file: str) -> dict:
     """
@@ -42,7 +136,8 @@ def output_json_response(json_input: dict, root_name: str,
     root_name: str
         Root name of the new json. It has to be in the input json
     output_file: str
-        Path to output file
+        Path to output file. The file is compressed with zstandard and '.zst'
+        is appended to the path
 
     Returns
     -------
@@ -53,23 +148,48 @@ def output_json_response(json_input: dict, root_name: str,
     json_data = {root_name: json_input['api'][root_name]}
 
     # Write output
-    with open(output_file, 'w') as f:
-        json.dump(json_data, f, indent=4)
+    dump_json(json_data, output_file + '.zst')
 
     return json_data
 
 
-def get_leagues(output_path: str = DATA_PATH) -> dict:
+def load_cached_json(output_file: str) -> dict:
+    """
+    Load a file written by output_json_response. The compressed file is
+    looked for first, then the uncompressed one of previous downloads.
+
+    Parameters
+    ----------
+    output_file: str
+        Path to output file, without the '.zst' extension
+
+    Returns
+    -------
+    json_data: dict
+        Content of the file, None if the file does not exist
+    """
+
+    file_path = cached_json_path(output_file)
+
+    return load_json(file_path) if file_path is not None else None
+
+
+def get_leagues(output_path: str = DATA_PATH,
+                country_filter: list = None) -> dict:
     """
     Get all the leagues. Only leagues with players-statistics level of detail
     are allowed.
     If output file does not already exists at output_path, it will call the API
-    and write the output.
+    and write the (compressed) output. The whole list of leagues is written,
+    the country filter is applied only to the returned json.
 
     Parameters
     ----------
     output_path : str, default params.DATA_PATH
         The output path where to write leagues.json
+    country_filter : list, default None
+        Country codes of the leagues to keep, e.g. params.COUNTRIES. If None,
+        all the leagues are returned
 
     Returns
     -------
@@ -80,15 +200,17 @@ def get_leagues(output_path: str = DATA_PATH) -> dict:
     output_file = os.path.join(output_path, 'leagues.json')
 
     # If file already exists, load into memory
-    if os.path.exists(output_file):
-        with open(output_file, 'r') as f:
-            leagues = json.load(f)
+    leagues = load_cached_json(output_file)
 
     # Otherwise, call the API
-    else:
+    if leagues is None:
         r_dict = get_json_response(ENDPOINTS['leagues'])
         leagues = output_json_response(r_dict, 'leagues', output_file)
 
+    if country_filter:
+        leagues = {'leagues': [x for x in leagues['leagues']
+                               if x['country_code'] in country_filter]}
+
     return leagues
 
 
@@ -98,7 +220,7 @@ def get_fixtures(league_id: int,
     """
     Get all the fixtures for given league.
     If output file does not already exists at output_path, it will call the API
-    and write the output.
+    and write the (compressed) output.
 
     Parameters
     ----------
@@ -116,12 +238,10 @@ def get_fixtures(league_id: int,
     output_file = os.path.join(output_path, f'fixtures_{league_id}.json')
 
     # If file already exists, load into memory
-    if os.path.exists(output_file):
-        with open(output_file, 'r') as f:
-            fixtures = json.load(f)
+    fixtures = load_cached_json(output_file)
 
     # Otherwise, call the API
-    else:
+    if fixtures is None:
         r_dict = get_json_response(
             '/'.join([ENDPOINTS['fixtures'], str(league_id)]))
         fixtures = output_json_response(r_dict, 'fixtures', output_file)
@@ -135,7 +255,7 @@ def get_fixture_stats(fixture_id: int,
     """
     Get team-level stats for given fixture.
     If output file does not already exists at output_path, it will call the API
-    and write the output.
+    and write the (compressed) output.
 
     Parameters
     ----------
@@ -153,12 +273,10 @@ def get_fixture_stats(fixture_id: int,
     output_file = os.path.join(output_path, f'fixture_stats_{fixture_id}.json')
 
     # If file already exists, load into memory
-    if os.path.exists(output_file):
-        with open(output_file, 'r') as f:
-            fixture_stats = json.load(f)
+    fixture_stats = load_cached_json(output_file)
 
     # Otherwise, call the API
-    else:
+    if fixture_stats is None:
         r_dict = get_json_response('/'.join([ENDPOINTS['fixture_stats'],
                                              str(fixture_id)]))
         # Force-append the fixture id
@@ -174,7 +292,7 @@ def get_player_stats(fixture_id: int,
     """
     Get player-level stats for given fixture.
     If output file does not already exists at output_path, it will call the API
-    and write the output.
+    and write the (compressed) output.
 
     Parameters
     ----------
@@ -192,14 +310,212 @@ def get_player_stats(fixture_id: int,
     output_file = os.path.join(output_path, f'player_stats_{fixture_id}.json')
 
     # If file already exists, load into memory
-    if os.path.exists(output_file):
-        with open(output_file, 'r') as f:
-            player_stats = json.load(f)
+    player_stats = load_cached_json(output_file)
 
     # Otherwise, call the API
-    else:
+    if player_stats is None:
         r_dict = get_json_response('/'.join([ENDPOINTS['player_stats'],
                                              str(fixture_id)]))
         player_stats = output_json_response(r_dict, 'players', output_file)
 
     return player_stats
+
+
+async def get_fixture_stats_async(client: httpx.AsyncClient,
+                                  limiter: RateLimiter,
+                                  fixture_id: int,
+                                  output_path: str = os.path.join(
+                                      DATA_PATH, 'fixture_stats')) -> dict:
+    """
+    Async version of get_fixture_stats. Requests are sent as allowed by the
+    limiter.
+
+    Parameters
+    ----------
+    client: httpx.AsyncClient
+        Client used to send the request
+    limiter: RateLimiter
+        Limiter of the requests to the API
+    fixture_id: int
+        ID of the fixture for which to retrieve stats
+    output_path: str, default os.path.join(params.DATA_PATH, 'fixture_stats')
+        The output path where to write stats file
+
+    Returns
+    -------
+    fixture_stats : dict
+        Json with the statistics for given fixture
+    """
+
+    output_file = os.path.join(output_path, f'fixture_stats_{fixture_id}.json')
+
+    # If file already exists, load into memory
+    fixture_stats = load_cached_json(output_file)
+
+    # Otherwise, call the API
+    if fixture_stats is None:
+        async with limiter:
+            r_dict = await get_json_response_async(
+                client, '/'.join([ENDPOINTS['fixture_stats'], str(fixture_id)])
+            )
+        # Force-append the fixture id
+        r_dict['api']['statistics']['fixture_id'] = fixture_id
+        fixture_stats = output_json_response(r_dict, 'statistics', output_file)
+
+    return fixture_stats
+
+
+async def get_player_stats_async(client: httpx.AsyncClient,
+                                 limiter: RateLimiter,
+                                 fixture_id: int,
+                                 output_path: str = os.path.join(
+                                     DATA_PATH, 'player_stats')) -> dict:
+    """
+    Async version of get_player_stats. Requests are sent as allowed by the
+    limiter.
+
+    Parameters
+    ----------
+    client: httpx.AsyncClient
+        Client used to send the request
+    limiter: RateLimiter
+        Limiter of the requests to the API
+    fixture_id: int
+        ID of the fixture for which to retrieve stats
+    output_path: str, default os.path.join(params.DATA_PATH, 'player_stats')
+        The output path where to write stats file
+
+    Returns
+    -------
+    player_stats : dict
+        Json with the statistics for all players of given fixture
+    """
+
+    output_file = os.path.join(output_path, f'player_stats_{fixture_id}.json')
+
+    # If file already exists, load into memory
+    player_stats = load_cached_json(output_file)
+
+    # Otherwise, call the API
+    if player_stats is None:
+        async with limiter:
+            r_dict = await get_json_response_async(
+                client, '/'.join([ENDPOINTS['player_stats'], str(fixture_id)])
+            )
+        player_stats = output_json_response(r_dict, 'players', output_file)
+
+    return player_stats
+
+
+async def gather_stats(get_method, fixture_ids: list, output_path: str,
+                       max_requests: int = MAX_CONCURRENT_REQUESTS,
+                       min_interval: float = MIN_REQUEST_INTERVAL) -> list:
+    """
+    Retrieve stats for all the given fixtures concurrently, over a shared pool
+    of connections, respecting the rate limit of the API.
+    A failed request does not stop the others: the error is printed and the
+    stats of that fixture are None, so that it can be retried later.
+    In a notebook, where an event loop is already running, await this
+    coroutine directly; otherwise use get_all_fixture_stats or
+    get_all_player_stats.
+
+    Parameters
+    ----------
+    get_method: func
+        get_fixture_stats_async or get_player_stats_async
+    fixture_ids: list
+        IDs of the fixtures for which to retrieve stats
+    output_path: str
+        The output path where to write stats files
+    max_requests: int, default params.MAX_CONCURRENT_REQUESTS
+        Maximum number of requests sent at the same time
+    min_interval: float, default params.MIN_REQUEST_INTERVAL
+        Minimum interval in seconds between the start of two requests
+
+    Returns
+    -------
+    stats : list
+        Jsons with the statistics, in the same order of fixture_ids; None for
+        the fixtures whose request failed
+    """
+
+    limiter = RateLimiter(max_requests, min_interval)
+    limits = httpx.Limits(max_connections=max_requests)
+    async with httpx.AsyncClient(http2=True, limits=limits,
+                                 timeout=30.0) as client:
+        results = await asyncio.gather(
+            *[get_method(client, limiter, fixture_id, output_path)
+              for fixture_id in fixture_ids],
+            return_exceptions=True
+        )
+
+    stats = []
+    for fixture_id, result in zip(fixture_ids, results):
+        if isinstance(result, Exception):
+            print(f'Fixture {fixture_id} --- {result}')
+            result = None
+        stats.append(result)
+
+    return stats
+
+
+def get_all_fixture_stats(fixture_ids: list,
+                          output_path: str = os.path.join(DATA_PATH,
+                                                          'fixture_stats'),
+                          max_requests: int = MAX_CONCURRENT_REQUESTS,
+                          min_interval: float = MIN_REQUEST_INTERVAL) -> list:
+    """
+    Get team-level stats for all the given fixtures, sending concurrent
+    requests to the API. See gather_stats.
+
+    Parameters
+    ----------
+    fixture_ids: list
+        IDs of the fixtures for which to retrieve stats
+    output_path: str, default os.path.join(params.DATA_PATH, 'fixture_stats')
+        The output path where to write stats files
+    max_requests: int, default params.MAX_CONCURRENT_REQUESTS
+        Maximum number of requests sent at the same time
+    min_interval: float, default params.MIN_REQUEST_INTERVAL
+        Minimum interval in seconds between the start of two requests
+
+    Returns
+    -------
+    fixtures_stats : list
+        Jsons with the statistics, in the same order of fixture_ids; None for
+        the fixtures whose request failed
+    """
+
+    return asyncio.run(gather_stats(get_fixture_stats_async, fixture_ids,
+                                    output_path, max_requests, min_interval))
+
+
+def get_all_player_stats(fixture_ids: list,
+                         output_path: str = os.path.join(DATA_PATH,
+                                                         'player_stats'),
+                         max_requests: int = MAX_CONCURRENT_REQUESTS,
+                         min_interval: float = MIN_REQUEST_INTERVAL) -> list:
+    """
+    Get player-level stats for all the given fixtures, sending concurrent
+    requests to the API. See gather_stats.
+
+    Parameters
+    ----------
+    fixture_ids: list
+        IDs of the fixtures for which to retrieve stats
+    output_path: str, default os.path.join(params.DATA_PATH, 'player_stats')
+        The output path where to write stats files
+    max_requests: int, default params.MAX_CONCURRENT_REQUESTS
+        Maximum number of requests sent at the same time
+    min_interval: float, default params.MIN_REQUEST_INTERVAL
+        Minimum interval in seconds between the start of two requests
+
+    Returns
+    -------
+    players_stats : list
+        Jsons with the statistics, in the same order of fixture_ids; None for
+        the fixtures whose request failed
+    """
+
+    return asyncio.run(gather_stats(get_player_stats_async, fixture_ids,
+                                    output_path, max_requests, min_interval))
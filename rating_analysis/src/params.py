@@ -1,3 +1,4 @@
+from types import MappingProxyType
 from utils import get_key
 
 DATA_PATH = './data'
@@ -11,7 +12,15 @@ ENDPOINTS = {
     'player_stats': 'https://api-football-v1.p.rapidapi.com/v2/players/fixture'
 }
 
-HEADERS = {
+# Read-only, so that the same headers are shared by every request
+HEADERS = MappingProxyType({
     'x-rapidapi-host': "api-football-v1.p.rapidapi.com",
     'x-rapidapi-key': get_key()
-}
+})
+
+# Maximum number of concurrent requests to the API
+MAX_CONCURRENT_REQUESTS = 16
+
+# Minimum interval in seconds between the start of two requests, to respect
+# the rate limit of the API
+MIN_REQUEST_INTERVAL = 10
@@ -1,18 +1,131 @@
 import os
-import json
-import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-from utils import safe_num_cast
+from utils import (cached_json_path, iter_json_items, load_json,
+                   safe_num_cast_column)
+
+# Default features of PlayerData
+_DEFAULT_ID = ('event_id', 'player_id', 'team_id')
+_DEFAULT_NUM = ('rating', 'minutes_played')
+_DEFAULT_CAT = ('player_name', 'team_name', 'position')
+_DEFAULT_BOOL = ('captain', 'substitute')
+_DEFAULT_STRUCT = ('shots', 'goals', 'passes', 'tackles', 'duels', 'dribbles',
+                   'fouls', 'cards', 'penalty')
+
+
+def list_json_files(json_path: str) -> list:
+    """
+    List the json files (plain or compressed) into a directory, sorted by name.
+
+    Parameters
+    ----------
+    json_path: str
+        Path to directory with json files
+
+    Returns
+    -------
+    entries: list
+        os.DirEntry of each json file
+    """
+
+    with os.scandir(json_path) as it:
+        entries = [e for e in it if e.name.endswith(('.json', '.json.zst'))]
+
+    return sorted(entries, key=lambda e: e.name)
+
+
+def is_cache_fresh(cache_path: str, source_path: str) -> bool:
+    """
+    Check if a cache file exists and is more recent than its source (file or
+    directory).
+
+    Parameters
+    ----------
+    cache_path: str
+        Path to the cache file
+    source_path: str
+        Path to the file or directory the cache has been built from
+
+    Returns
+    -------
+    bool - True if the cache can be used, otherwise False
+    """
+
+    return (os.path.exists(cache_path) and
+            os.path.getmtime(cache_path) >= os.path.getmtime(source_path))
+
+
+def read_cache(cache_path: str, source_path: str,
+               cache_key: str = None) -> pd.DataFrame:
+    """
+    Read a parquet cache written by write_cache, if it is more recent than its
+    source and it has been built with the same cache key.
+
+    Parameters
+    ----------
+    cache_path: str
+        Path to the parquet cache file
+    source_path: str
+        Path to the file or directory the cache has been built from
+    cache_key: str, default None
+        Description of how the cache has been built, e.g. the processed
+        features
+
+    Returns
+    -------
+    df: pandas.DataFrame
+        Cached DataFrame, None if the cache can not be used
+    """
+
+    if not is_cache_fresh(cache_path, source_path):
+        return None
+    metadata = pq.read_schema(cache_path).metadata or {}
+    if metadata.get(b'cache_key', b'').decode() != (cache_key or ''):
+        return None
+
+    return pd.read_parquet(cache_path)
+
+
+def write_cache(df: pd.DataFrame, cache_path: str, cache_key: str = None):
+    """
+    Write a DataFrame to a parquet cache, storing the cache key into the file
+    metadata.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        DataFrame to cache
+    cache_path: str
+        Path to the parquet cache file
+    cache_key: str, default None
+        Description of how the cache has been built, see read_cache
+    """
+
+    table = pa.Table.from_pandas(df)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'cache_key': (cache_key or '').encode()
+    })
+    pq.write_table(table, cache_path, compression='zstd')
 
 
 def process_directory(json_path: str,
                       process_method,
+                      post_method=None,
+                      cache_path: str = None,
+                      cache_key: str = None,
                       **kwargs) -> pd.DataFrame:
     """
     Given a path to a directory with json files, process each file with a given
     method and store all data into a pandas DataFrame.
     You can pass additional keyword arguments to process method.
+    If a cache path is given, the DataFrame is also written there as parquet
+    and read back on the next calls, as long as the directory and the cache key
+    do not change.
 
     Parameters
     ----------
@@ -20,6 +133,14 @@ def process_directory(json_path: str,
         Path to directory with json files
     process_method: func
         Method to process each json read into files
+    post_method: func, default None
+        Method applied to the whole DataFrame, before writing the cache
+    cache_path: str, default None
+        Path to the parquet cache file. It must be outside json_path. If None,
+        no cache is used
+    cache_key: str, default None
+        Description of the processing, e.g. the processed features. A cache
+        built with a different key is not used
 
     Returns
     -------
@@ -28,28 +149,120 @@ def process_directory(json_path: str,
 
     """
 
-    files = os.listdir(json_path)
-    tot_files = len(files)
+    # If the directory and the processing have not changed since last run,
+    # read the cache
+    if cache_path is not None:
+        df = read_cache(cache_path, json_path, cache_key)
+        if df is not None:
+            return df
 
-    # Initialize empty dataframe
-    df = pd.DataFrame()
+    files = list_json_files(json_path)
+    tot_files = len(files)
 
-    # Iterate on each file and append to DataFrame
-    for i, json_file in enumerate(files):
-        print(f'{i + 1} / {tot_files} --- {json_file}')
-        df = df.append(
-            process_file(
-                file_path=os.path.join(json_path, json_file),
-                process_method=process_method,
-                **kwargs
-            )
+    # Process files in parallel on all cores (results keep the order of the
+    # files), collect the rows of all files, then build the DataFrame just once.
+    # Process method and keyword arguments are sent to the workers, so they
+    # must be picklable
+    idx = []
+    rows = []
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(
+            partial(file_to_records, process_method=process_method, **kwargs),
+            [json_file.path for json_file in files],
+            chunksize=16
         )
+        for i, (json_file, (file_rows, file_idx)) in enumerate(zip(files,
+                                                                   results)):
+            print(f'{i + 1} / {tot_files} --- {json_file.name}')
+            rows.extend(file_rows)
+            idx.extend(file_idx)
+
+    df = rows_to_frame(rows, idx)
+
+    if post_method is not None:
+        df = post_method(df)
+
+    if cache_path is not None:
+        write_cache(df, cache_path, cache_key)
 
     return df
 
 
+def rows_to_frame(rows: list, idx: list) -> pd.DataFrame:
+    """
+    Build a pandas DataFrame from a list of rows. When all rows share the same
+    keys, the DataFrame is built column by column from known columns.
+
+    Parameters
+    ----------
+    rows: list
+        Rows of the DataFrame, as dicts
+    idx: list
+        Index labels of the rows
+
+    Returns
+    -------
+    df: pandas.DataFrame
+        DataFrame with given rows
+    """
+
+    if rows:
+        cols = rows[0].keys()
+        if all(row.keys() == cols for row in rows):
+            return pd.DataFrame({x: [row[x] for row in rows] for x in cols},
+                                index=idx)
+
+    return pd.DataFrame.from_records(rows, index=idx)
+
+
+def file_to_records(file_path: str,
+                    process_method,
+                    stream: bool = False,
+                    **kwargs) -> tuple:
+    """
+    Given a path to a json file, process each json into a row.
+    You can pass additional keyword arguments to process method.
+
+    Parameters
+    ----------
+    file_path: str
+        Path to a json file
+    process_method: func
+        Method to process json read into file. It has to return a tuple with
+        the index label and a dict with the row data
+    stream: bool, default False
+        If True, stream the jsons of the file instead of loading it whole. It
+        is slower, use it only for files too big for memory
+
+    Returns
+    -------
+    rows: list
+        Processed rows, as dicts
+    idx: list
+        Index labels of the rows
+    """
+
+    if stream:
+        jsons = iter_json_items(file_path)
+    else:
+        json_file = load_json(file_path)
+        root = next(iter(json_file))
+        jsons = json_file[root]
+
+    # Collect index labels and rows
+    idx = []
+    rows = []
+    for j_orig in jsons:
+        ind, row = process_method(j_orig, **kwargs)
+        idx.append(ind)
+        rows.append(row)
+
+    return rows, idx
+
+
 def process_file(file_path: str,
                  process_method,
+                 stream: bool = False,
                  **kwargs) -> pd.DataFrame:
     """
     Given a path to a player statistics file, process statistics data to a
@@ -61,7 +274,10 @@ def process_file(file_path: str,
     file_path: str
         Path to a json file
     process_method: func
-        Method to process json read into file
+        Method to process json read into file. It has to return a tuple with
+        the index label and a dict with the row data
+    stream: bool, default False
+        If True, stream the jsons of the file, see file_to_records
 
     Returns
     -------
@@ -69,21 +285,9 @@ def process_file(file_path: str,
         Output DataFrame with processed data
     """
 
-    # Load data into dict
-    with open(file_path, 'r') as f:
-        json_file = json.load(f)
-
-    # Initialize empty dataframe
-    df = pd.DataFrame()
+    rows, idx = file_to_records(file_path, process_method, stream, **kwargs)
 
-    # Iterate on each json and append to DataFrame
-    root = list(json_file)[0]
-    for j_orig in json_file[root]:
-        df = df.append(
-            process_method(j_orig, **kwargs)
-        )
-
-    return df
+    return rows_to_frame(rows, idx)
 
 
 class LeagueData:
@@ -92,6 +296,14 @@ class LeagueData:
     data
     """
 
+    # (team key, field, output name) of the team info of a fixture
+    _TEAM_OUTPUT = (
+        ('homeTeam', 'team_id', 'homeTeam.id'),
+        ('homeTeam', 'team_name', 'homeTeam.name'),
+        ('awayTeam', 'team_id', 'awayTeam.id'),
+        ('awayTeam', 'team_name', 'awayTeam.name')
+    )
+
     def __init__(self):
         self.fixture_stats_feat = [
             'Shots on Goal', 'Shots off Goal', 'Total Shots', 'Blocked Shots',
@@ -99,14 +311,19 @@ class LeagueData:
             'Offsides', 'Ball Possession', 'Yellow Cards', 'Red Cards',
             'Goalkeeper Saves', 'Total passes', 'Passes accurate', 'Passes %'
         ]
+        # Output names of the fixture statistics, computed once
+        to_underscore = str.maketrans(' ', '_')
+        self._home_keys = ['home.' + feat.translate(to_underscore)
+                           for feat in self.fixture_stats_feat]
+        self._away_keys = ['away.' + feat.translate(to_underscore)
+                           for feat in self.fixture_stats_feat]
         self.league_numerical_feat = ['elapsed', 'goalsHomeTeam',
                                       'goalsAwayTeam']
         self.league_info_feat = ['name', 'country']
 
-    def json_to_pandas_league(self,
-                              j_fixture: dict) -> pd.DataFrame:
+    def _league_row_dict(self, j_fixture: dict) -> tuple:
         """
-        Return a pandas DataFrame from a fixture info json.
+        Return the index label and the row data from a fixture info json.
 
         Parameters
         ----------
@@ -115,35 +332,54 @@ class LeagueData:
 
         Returns
         -------
-        fixture_data: pandas.DataFrame
+        ind: str
+            Index label of the fixture
+        new_j: dict
             Row of a pandas DataFrame with processed fixture info
         """
 
         # Numerical data
         new_j = {x: j_fixture[x] for x in self.league_numerical_feat}
         # League info
-        new_j.update(
-            {'league_' + x: j_fixture['league'][x]
-             for x in self.league_info_feat}
-        )
-        # Epoch to datetime
-        new_j['fixture_date'] = datetime.datetime.fromtimestamp(
-            j_fixture['event_timestamp']
-        )
+        league = j_fixture['league']
+        new_j.update(('league_' + x, league[x]) for x in self.league_info_feat)
+        # Epoch - it is cast to datetime on the whole DataFrame
+        new_j['fixture_date'] = j_fixture['event_timestamp']
 
         # Structured data
-        new_j.update({'.'.join([x, y.replace('team_', '')]): j_fixture[x][y]
-                      for x in ['homeTeam', 'awayTeam']
-                      for y in ['team_id', 'team_name']})
-        new_j.update({'.'.join(['score', x]): j_fixture['score'][x]
-                      for x in j_fixture['score']})
-
-        # In order to return a DataFrame row, create an index with
-        # concatenation of IDs
+        for team, field, out_key in self._TEAM_OUTPUT:
+            new_j[out_key] = j_fixture[team][field]
+        score = j_fixture['score']
+        new_j.update(('score.' + x, score[x]) for x in score)
+
+        # Create an index with concatenation of IDs
         ind = '_'.join([str(j_fixture[feat])
                         for feat in ['league_id', 'fixture_id']])
 
+        return ind, new_j
+
+    def json_to_pandas_league(self,
+                              j_fixture: dict) -> pd.DataFrame:
+        """
+        Return a pandas DataFrame from a fixture info json. To process many
+        fixtures use process_league, that builds the DataFrame just once.
+
+        Parameters
+        ----------
+        j_fixture: dict
+            Input json with fixture info
+
+        Returns
+        -------
+        fixture_data: pandas.DataFrame
+            Row of a pandas DataFrame with processed fixture info
+        """
+
+        ind, new_j = self._league_row_dict(j_fixture)
         fixture_row = pd.DataFrame(new_j, index=[ind])
+        fixture_row['fixture_date'] = pd.to_datetime(
+            fixture_row['fixture_date'], unit='s'
+        )
 
         return fixture_row
 
@@ -153,7 +389,8 @@ class LeagueData:
         Parameters
         ----------
         league_file: str
-            Path to league file
+            Path to league file. If only its compressed version
+            '<league_file>.zst' exists, that one is read
 
         Returns
         -------
@@ -161,16 +398,39 @@ class LeagueData:
             DataFrame with all fixtures info in the given file
         """
 
+        # Files downloaded by get_data are compressed
+        league_file = cached_json_path(league_file) or league_file
         league_data = process_file(file_path=league_file,
-                                   process_method=self.json_to_pandas_league)
+                                   process_method=self._league_row_dict)
+
+        # Epoch to datetime. A league with no fixtures has no columns
+        if 'fixture_date' in league_data:
+            league_data['fixture_date'] = pd.to_datetime(
+                league_data['fixture_date'], unit='s'
+            )
+
+        # Few distinct values - store them as categorical
+        for x in ['league_' + x for x in self.league_info_feat]:
+            if x in league_data:
+                league_data[x] = league_data[x].astype('category')
+        # Home and away teams share the same categories, so that they can be
+        # compared
+        team_cols = [out_key for _, field, out_key in self._TEAM_OUTPUT
+                     if field == 'team_name' and out_key in league_data]
+        if team_cols:
+            teams = pd.CategoricalDtype(sorted(set().union(
+                *[league_data[x].dropna().unique() for x in team_cols]
+            )))
+            for x in team_cols:
+                league_data[x] = league_data[x].astype(teams)
 
         return league_data
 
-    def json_to_pandas_fixture_stats(self,
-                                     j_fixture: dict) -> pd.DataFrame:
+    def _fixture_stats_row_dict(self, j_fixture: dict) -> tuple:
         """
-        Return a pandas DataFrame row from a fixture statistics json. The
-        structured features are unpacked.
+        Return the index label and the row data from a fixture statistics
+        json. The structured features are unpacked; values are left as they
+        are in the json, see process_fixtures for the numerical cast.
 
         Parameters
         ----------
@@ -179,23 +439,46 @@ class LeagueData:
 
         Returns
         -------
-        fixture_row: pandas DataFrame
+        fixture_id: int
+            Index label of the fixture
+        new_j: dict
             Row of a pandas DataFrame with fixture stats data
         """
 
         # Build a new dictionary with processed data
         # First add home data
-        new_j = {'.'.join(['home', feat.replace(' ', '_')]):
-                 safe_num_cast(j_fixture[feat]['home'])
-                 for feat in self.fixture_stats_feat}
+        new_j = dict(zip(self._home_keys,
+                         [j_fixture[feat]['home']
+                          for feat in self.fixture_stats_feat]))
         # Then add away data
-        new_j.update({'.'.join(['away', feat.replace(' ', '_')]):
-                      safe_num_cast(j_fixture[feat]['away'])
-                      for feat in self.fixture_stats_feat})
+        new_j.update(zip(self._away_keys,
+                         [j_fixture[feat]['away']
+                          for feat in self.fixture_stats_feat]))
 
-        fixture_row = pd.DataFrame(new_j, index=[j_fixture['fixture_id']])
+        return j_fixture['fixture_id'], new_j
 
-        return fixture_row
+    def json_to_pandas_fixture_stats(self,
+                                     j_fixture: dict) -> pd.DataFrame:
+        """
+        Return a pandas DataFrame row from a fixture statistics json. The
+        structured features are unpacked. To process many fixtures use
+        process_fixtures, that builds the DataFrame just once.
+
+        Parameters
+        ----------
+        j_fixture: dict
+            Input json with fixture statistics
+
+        Returns
+        -------
+        fixture_row: pandas DataFrame
+            Row of a pandas DataFrame with fixture stats data
+        """
+
+        ind, new_j = self._fixture_stats_row_dict(j_fixture)
+        fixture_row = pd.DataFrame(new_j, index=[ind])
+
+        return fixture_row.apply(safe_num_cast_column)
 
     def process_fixtures(self, fixtures_path: str) -> pd.DataFrame:
         """
@@ -211,26 +494,28 @@ class LeagueData:
             DataFrame with all fixture statistics on the given directory
         """
 
-        files = os.listdir(fixtures_path)
+        files = list_json_files(fixtures_path)
         tot_files = len(files)
 
-        # Initialize empty dataframe
-        fixture_data = pd.DataFrame()
+        # Load files concurrently (results keep the order of the files).
+        # Collect index labels and rows, then build the DataFrame just once
+        idx = []
+        rows = []
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = executor.map(load_json, [e.path for e in files])
+            for i, (entry, json_file) in enumerate(zip(files, results)):
+                print(f'{i + 1} / {tot_files} --- {entry.name}')
 
-        # Iterate on each file and append to DataFrame
-        for i, json_file_path in enumerate(files):
-            print(f'{i + 1} / {tot_files} --- {json_file_path}')
-
-            with open(os.path.join(fixtures_path, json_file_path), 'r') as f:
-                json_file = json.load(f)
-
-            fixture_data = fixture_data.append(
-                self.json_to_pandas_fixture_stats(
+                ind, row = self._fixture_stats_row_dict(
                     j_fixture=json_file['statistics']
                 )
-            )
+                idx.append(ind)
+                rows.append(row)
+
+        fixture_data = rows_to_frame(rows, idx)
 
-        return fixture_data
+        # Cast all the statistics to numbers, one column at a time
+        return fixture_data.apply(safe_num_cast_column)
 
 
 class PlayerData:
@@ -266,29 +551,152 @@ class PlayerData:
             'dribbles', 'fouls', 'cards', 'penalty']
         """
 
-        if id_features is None:
-            id_features = ['event_id', 'player_id', 'team_id']
-        if num_features is None:
-            num_features = ['rating', 'minutes_played']
-        if cat_features is None:
-            cat_features = ['player_name', 'team_name', 'position']
-        if bool_features is None:
-            bool_features = ['captain', 'substitute']
-        if struct_features is None:
-            struct_features = ['shots', 'goals', 'passes', 'tackles',
-                               'duels', 'dribbles', 'fouls', 'cards',
-                               'penalty']
-        self.id_features = id_features
-        self.num_features = num_features
-        self.cat_features = cat_features
-        self.bool_features = bool_features
-        self.struct_features = struct_features
+        self.id_features = list(
+            id_features if id_features is not None else _DEFAULT_ID
+        )
+        self.num_features = list(
+            num_features if num_features is not None else _DEFAULT_NUM
+        )
+        self.cat_features = list(
+            cat_features if cat_features is not None else _DEFAULT_CAT
+        )
+        self.bool_features = list(
+            bool_features if bool_features is not None else _DEFAULT_BOOL
+        )
+        self.struct_features = list(
+            struct_features if struct_features is not None else _DEFAULT_STRUCT
+        )
+        # Prefix of the output names of each structured feature
+        self._struct_prefixes = tuple((feat, feat + '.')
+                                      for feat in self.struct_features)
+        # Output names of the structured sub-keys as
+        # {feat: {sub_key: 'feat.sub_key'}}, and all the output names of a row
+        # in order. Both are filled by the first processed json, and extended
+        # by any json with new sub-keys
+        self._reset_output_keys()
+
+    def _cache_key(self) -> str:
+        """
+        Describe the processed features, so that a parquet cache built with
+        different features is not used.
+
+        Returns
+        -------
+        cache_key: str
+            Features of each type
+        """
+
+        return repr((self.id_features, self.num_features, self.cat_features,
+                     self.bool_features, self.struct_features))
+
+    def _reset_output_keys(self):
+        """
+        Forget the output names of the previous jsons, so that a new fixture or
+        league does not inherit their sub-keys.
+        """
+
+        self._struct_key_cache = {}
+        self._output_keys = None
+
+    def _build_output_keys(self, j_player: dict):
+        """
+        Fill the output names of a row from a player statistics json.
+
+        Parameters
+        ----------
+        j_player: dict
+            Input json with player statistics
+        """
+
+        self._struct_key_cache = {
+            feat: {x: prefix + x for x in j_player[feat]}
+            for feat, prefix in self._struct_prefixes
+        }
+        self._output_keys = [*self.cat_features, *self.num_features,
+                             *self.bool_features]
+        for sub_keys in self._struct_key_cache.values():
+            self._output_keys.extend(sub_keys.values())
+
+    def _add_struct_keys(self, feat: str, sub: dict):
+        """
+        Add the output names of the sub-keys of a structured feature not seen
+        in the previous jsons.
+
+        Parameters
+        ----------
+        feat: str
+            Structured feature
+        sub: dict
+            Value of the structured feature in a player statistics json
+        """
+
+        sub_keys = self._struct_key_cache[feat]
+        for x in sub:
+            if x not in sub_keys:
+                sub_keys[x] = feat + '.' + x
+                self._output_keys.append(sub_keys[x])
+
+    def _player_row_dict(self, j_player: dict) -> tuple:
+        """
+        Return the index label and the row data from a player statistics
+        json. The structured features are unpacked; numerical values are left
+        as they are in the json, see cast_numerical.
+
+        Parameters
+        ----------
+        j_player: dict
+            Input json with player statistics
+
+        Returns
+        -------
+        ind: str
+            Index label of the player
+        new_j: dict
+            Row of a pandas DataFrame with player's data
+        """
+
+        # Output names are built for the first json, and extended if this one
+        # has new sub-keys
+        if self._output_keys is None:
+            self._build_output_keys(j_player)
+        else:
+            for feat, sub_keys in self._struct_key_cache.items():
+                if not sub_keys.keys() >= j_player[feat].keys():
+                    self._add_struct_keys(feat, j_player[feat])
+
+        # Build a new dictionary with processed data, with all the output keys
+        # already in place
+        new_j = dict.fromkeys(self._output_keys)
+
+        # Categorical features stay the same
+        for x in self.cat_features:
+            new_j[x] = j_player[x]
+
+        # Numerical features - they are cast to float on the whole DataFrame
+        for x in self.num_features:
+            new_j[x] = j_player[x]
+
+        # Boolean features as real boolean
+        for x in self.bool_features:
+            new_j[x] = j_player[x] == 'True'
+
+        # For structured data, a new key-value pair for each sub-key. Sub-keys
+        # missing in this json stay None
+        for feat, sub_keys in self._struct_key_cache.items():
+            for x, value in j_player[feat].items():
+                new_j[sub_keys[x]] = value
+
+        # Create an index with concatenation of id_features
+        ind = '_'.join([str(j_player[feat]) for feat in self.id_features])
+
+        return ind, new_j
 
     def json_to_pandas_player(self,
                               j_player: dict) -> pd.DataFrame:
         """
         Return a pandas DataFrame row from a player statistics json. The
-        structured features are unpacked.
+        structured features are unpacked. To process many players use
+        process_fixture or process_league, that build the DataFrame just once.
 
         Parameters
         ----------
@@ -301,39 +709,51 @@ class PlayerData:
             Row of a pandas DataFrame with player's data
         """
 
-        # Build a new dictionary with processed data
-        # Initiate with categorical features - they stay the same
-        new_j = {x: j_player[x] for x in self.cat_features}
+        self._reset_output_keys()
+        ind, new_j = self._player_row_dict(j_player)
+        player_row = pd.DataFrame(new_j, index=[ind])
 
-        # Add numerical features forcing a float transformation
-        new_j.update({x: safe_num_cast(j_player[x]) for x in self.num_features})
+        return self.cast_numerical(player_row)
 
-        # Add boolean features as real boolean
-        new_j.update(
-            {x: True if j_player[x] == 'True' else False
-             for x in self.bool_features}
-        )
+    def cast_numerical(self, players_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Cast numerical and structured features to float, one column at a time.
 
-        # For structured data, create a new key-value pair for each sub-key
-        for feat in self.struct_features:
-            new_j.update({'.'.join([feat, x]): safe_num_cast(j_player[feat][x])
-                          for x in j_player[feat]})
+        Parameters
+        ----------
+        players_data: pandas.DataFrame
+            DataFrame built from _player_row_dict rows
 
-        # In order to return a DataFrame row, create an index with
-        # concatenation of id_features
-        ind = '_'.join([str(j_player[feat]) for feat in self.id_features])
+        Returns
+        -------
+        players_data: pandas.DataFrame
+            Same DataFrame with numerical columns
+        """
 
-        player_row = pd.DataFrame(new_j, index=[ind])
+        struct_prefixes = tuple(prefix for _, prefix in self._struct_prefixes)
+        num_cols = [x for x in players_data.columns
+                    if x in self.num_features or x.startswith(struct_prefixes)]
+        players_data[num_cols] = players_data[num_cols].apply(
+            safe_num_cast_column
+        )
 
-        return player_row
+        return players_data
 
-    def process_fixture(self, fixture_path: str) -> pd.DataFrame:
+    def process_fixture(self, fixture_path: str,
+                        use_cache: bool = False) -> pd.DataFrame:
         """
+        If use_cache is True, the processed DataFrame is cached into a parquet
+        file next to the fixture file, '<fixture_path>.parquet', and read back
+        on the next calls as long as the fixture file and the features do not
+        change. To cache a whole league use the cache_path of process_league.
 
         Parameters
         ----------
         fixture_path: str
-            Path to directory with player statistics files
+            Path to directory with player statistics files. If only its
+            compressed version '<fixture_path>.zst' exists, that one is read
+        use_cache: bool, default False
+            If True, read and write the parquet cache
 
         Returns
         -------
@@ -341,20 +761,62 @@ class PlayerData:
             DataFrame with all players statistics on the given directory
         """
 
-        players_data = process_file(
-            file_path=fixture_path,
-            process_method=self.json_to_pandas_player
+        # Files downloaded by get_data are compressed
+        fixture_path = cached_json_path(fixture_path) or fixture_path
+        cache_path = fixture_path + '.parquet'
+        if use_cache:
+            players_data = read_cache(cache_path, fixture_path,
+                                      self._cache_key())
+            if players_data is not None:
+                return players_data
+
+        self._reset_output_keys()
+        players_data = self.cast_numerical(
+            process_file(
+                file_path=fixture_path,
+                process_method=self._player_row_dict
+            )
         )
 
+        if use_cache:
+            write_cache(players_data, cache_path, self._cache_key())
+
         return players_data
 
-    def process_league(self, league_path: str) -> pd.DataFrame:
+    def _league_post_process(self, league_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Set the types of the whole league DataFrame: numerical features are
+        cast to float and categorical features, that have few distinct values
+        over a league, to pandas categorical.
+
+        Parameters
+        ----------
+        league_data: pandas.DataFrame
+            DataFrame built from _player_row_dict rows
+
+        Returns
+        -------
+        league_data: pandas.DataFrame
+            Same DataFrame with updated types
+        """
+
+        league_data = self.cast_numerical(league_data)
+        for x in self.cat_features:
+            if x in league_data:
+                league_data[x] = league_data[x].astype('category')
+
+        return league_data
+
+    def process_league(self, league_path: str,
+                       cache_path: str = None) -> pd.DataFrame:
         """
 
         Parameters
         ----------
         league_path: str
             Path to league directory with players stats
+        cache_path: str, default None
+            Path to a parquet cache file, see process_directory
 
         Returns
         -------
@@ -362,9 +824,15 @@ class PlayerData:
             DataFrame with all players stats into given directory
         """
 
+        # Workers get a copy of this instance, so the output names are reset
+        # before sending it
+        self._reset_output_keys()
         league_data = process_directory(
             json_path=league_path,
-            process_method=self.json_to_pandas_player
+            process_method=self._player_row_dict,
+            post_method=self._league_post_process,
+            cache_path=cache_path,
+            cache_key=self._cache_key()
         )
 
         return league_data
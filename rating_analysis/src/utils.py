@@ -1,7 +1,29 @@
 import os
-import numpy as np
+from functools import lru_cache
+import ijson
+import zstandard
+import pandas as pd
 
+# orjson is much faster than the standard json module, which is used only if
+# orjson is not installed
+try:
+    import orjson
 
+    json_loads = orjson.loads
+
+    def json_dumps(json_file: dict) -> bytes:
+        return orjson.dumps(json_file, option=orjson.OPT_INDENT_2)
+
+except ImportError:
+    import json
+
+    json_loads = json.loads
+
+    def json_dumps(json_file: dict) -> bytes:
+        return json.dumps(json_file, indent=2).encode()
+
+
+@lru_cache(maxsize=1)
 def get_key(key_file='~/rapidapi-key.txt'):
     with open(os.path.expanduser(key_file), 'r') as f:
         key = f.read().replace('\n', '')
@@ -9,14 +31,63 @@ def get_key(key_file='~/rapidapi-key.txt'):
     return key
 
 
-def safe_num_cast(num: str) -> float:
-    try:
-        # If % is the last chararcter, interpret as percentage
-        if str(num)[-1] == '%':
-            num = np.float(num[:-1]) / 100
-        # Otherwise transform into float
-        else:
-            num = np.float(num)
-        return num
-    except:
-        return np.nan
+def load_json(file_path: str) -> dict:
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    # Files ending with .zst are compressed with zstandard
+    if file_path.endswith('.zst'):
+        data = zstandard.ZstdDecompressor().decompress(data)
+
+    return json_loads(data)
+
+
+def cached_json_path(file_path: str) -> str:
+    # Path of a json file downloaded by get_data, without the '.zst'
+    # extension: the compressed file is looked for first, then the
+    # uncompressed one of previous downloads. None if none exists
+    for path in [file_path + '.zst', file_path]:
+        if os.path.exists(path):
+            return path
+
+    return None
+
+
+def iter_json_items(file_path: str):
+    # Stream the items of the list under the root key of the json file, without
+    # loading the whole file into memory
+    with open(file_path, 'rb') as f:
+        stream = f
+        # Files ending with .zst are compressed with zstandard
+        if file_path.endswith('.zst'):
+            stream = zstandard.ZstdDecompressor().stream_reader(f)
+        events = ijson.parse(stream, use_float=True)
+        # The first key of the top-level object is the root
+        for _, event, value in events:
+            if event == 'map_key':
+                root = value
+                break
+        yield from ijson.items(events, f'{root}.item')
+
+
+def dump_json(json_file: dict, file_path: str):
+    data = json_dumps(json_file)
+    # Files ending with .zst are compressed with zstandard
+    if file_path.endswith('.zst'):
+        data = zstandard.ZstdCompressor(level=3).compress(data)
+    with open(file_path, 'wb') as f:
+        f.write(data)
+
+
+def safe_num_cast_column(col: pd.Series) -> pd.Series:
+    # Cast a whole column to float at once. Values ending with % are
+    # interpreted as percentages, e.g. '55%' -> 0.55; values that can not be
+    # cast (None, '', '-', ...) become NaN
+    if pd.api.types.is_numeric_dtype(col):
+        return col.astype(float)
+    col = col.astype(str)
+    is_perc = col.str.endswith('%')
+    # Percentages need a special handling only if the column has any
+    if not is_perc.any():
+        return pd.to_numeric(col, errors='coerce').astype(float)
+    num = pd.to_numeric(col.where(~is_perc, col.str[:-1]), errors='coerce')
+    return num.where(~is_perc, num / 100).astype(float)
@@ -0,0 +1,326 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import preprocess
+from preprocess import LeagueData, PlayerData
+from utils import dump_json
+
+STRUCT_FEATURES = ['shots', 'goals', 'passes', 'tackles', 'duels', 'dribbles',
+                   'fouls', 'cards', 'penalty']
+
+
+def to_float(value):
+    """
+    Plain Python cast of a json value: percentages to fractions, anything
+    that is not a number to NaN
+    """
+
+    if isinstance(value, str) and value.endswith('%'):
+        return float(value[:-1]) / 100
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def make_player(event_id, player_id):
+    """
+    Synthetic player statistics, in the format of the API
+    """
+
+    return {
+        'event_id': event_id, 'player_id': player_id,
+        'team_id': 10 + player_id % 2,
+        'player_name': f'Player {player_id}',
+        'team_name': 'Home' if player_id % 2 else 'Away',
+        'position': 'GDMF'[player_id % 4],
+        'rating': ('–' if player_id % 5 == 0
+                   else f'{6 + player_id % 3}.{player_id}'),
+        'minutes_played': 90 - player_id,
+        'captain': 'True' if player_id == 1 else 'False',
+        'substitute': 'False',
+        'shots': {'total': player_id % 3, 'on': None},
+        'goals': {'total': player_id % 2, 'conceded': 0, 'assists': None,
+                  'saves': 0},
+        'passes': {'total': 30 + player_id, 'key': 1,
+                   'accuracy': f'{70 + player_id}%'},
+        'tackles': {'total': 1, 'blocks': 0, 'interceptions': 2},
+        'duels': {'total': 10, 'won': 5},
+        'dribbles': {'attempts': 2, 'success': 1, 'past': None},
+        'fouls': {'drawn': 1, 'committed': 0},
+        'cards': {'yellow': 0, 'red': 0},
+        'penalty': {'won': 0, 'commited': None, 'success': 0, 'missed': 0,
+                    'saved': 0}
+    }
+
+
+def make_fixtures(n_fixtures=4):
+    """
+    Player statistics of some fixtures, with players missing a sub-key or
+    having an extra one
+    """
+
+    fixtures = {}
+    for event_id in range(1, n_fixtures + 1):
+        players = [make_player(event_id, player_id)
+                   for player_id in range(1, 7)]
+        if event_id == 2:
+            del players[0]['goals']['saves']
+        if event_id == 3:
+            players[-1]['passes']['extra_key'] = 3
+        fixtures[event_id] = players
+
+    return fixtures
+
+
+def write_player_stats(path, fixtures):
+    """
+    Write a league directory, alternating plain and compressed files
+    """
+
+    os.makedirs(path)
+    for event_id, players in fixtures.items():
+        ext = '.json.zst' if event_id % 2 else '.json'
+        dump_json({'players': players},
+                  os.path.join(path, f'player_stats_{event_id}{ext}'))
+
+
+def expected_players(fixtures):
+    """
+    Expected output of PlayerData.process_league with default features
+    """
+
+    idx = []
+    rows = []
+    for players in fixtures.values():
+        for player in players:
+            idx.append(f"{player['event_id']}_{player['player_id']}_"
+                       f"{player['team_id']}")
+            row = {x: player[x] for x in ['player_name', 'team_name',
+                                          'position']}
+            row.update((x, to_float(player[x]))
+                       for x in ['rating', 'minutes_played'])
+            row.update((x, player[x] == 'True')
+                       for x in ['captain', 'substitute'])
+            for feat in STRUCT_FEATURES:
+                row.update((f'{feat}.{x}', to_float(v))
+                           for x, v in player[feat].items())
+            rows.append(row)
+
+    df = pd.DataFrame(rows, index=idx)
+    for x in ['player_name', 'team_name', 'position']:
+        df[x] = df[x].astype('category')
+
+    return df
+
+
+def make_fixture_stats(fixture_id):
+    """
+    Synthetic team statistics of a fixture, in the format of the API
+    """
+
+    stats = {feat: {'home': str(fixture_id), 'away': None}
+             for feat in LeagueData().fixture_stats_feat}
+    stats['Ball Possession'] = {'home': '55%', 'away': '45%'}
+    stats['Passes %'] = {'home': f'{80 + fixture_id}%', 'away': '-'}
+    stats['fixture_id'] = fixture_id
+
+    return stats
+
+
+def make_league_fixture(fixture_id):
+    """
+    Synthetic fixture info, in the format of the API
+    """
+
+    home, away = ('Inter', 'Milan') if fixture_id % 2 else ('Milan', 'Roma')
+    return {
+        'fixture_id': fixture_id, 'league_id': 891,
+        'league': {'name': 'Serie A', 'country': 'Italy'},
+        'event_timestamp': 1600000000 + 3600 * fixture_id,
+        'elapsed': 90, 'goalsHomeTeam': fixture_id % 3, 'goalsAwayTeam': 1,
+        'homeTeam': {'team_id': len(home), 'team_name': home},
+        'awayTeam': {'team_id': len(away), 'team_name': away},
+        'score': {'halftime': '1-0', 'fulltime': f'{fixture_id % 3}-1'}
+    }
+
+
+def test_process_league(tmp_path):
+    fixtures = make_fixtures()
+    league_path = str(tmp_path / 'league')
+    write_player_stats(league_path, fixtures)
+
+    players = PlayerData().process_league(league_path)
+
+    pd.testing.assert_frame_equal(players, expected_players(fixtures),
+                                  check_like=True)
+    assert players['goals.saves'].isna().sum() == 1
+    assert players['passes.extra_key'].notna().sum() == 1
+
+
+def test_process_league_reused_instance(tmp_path):
+    # A league processed after another one does not inherit its sub-keys
+    first, second = make_fixtures(3), make_fixtures(1)
+    write_player_stats(str(tmp_path / 'first'), first)
+    write_player_stats(str(tmp_path / 'second'), second)
+
+    pdata = PlayerData()
+    pdata.process_league(str(tmp_path / 'first'))
+    players = pdata.process_league(str(tmp_path / 'second'))
+
+    assert 'passes.extra_key' not in players
+    pd.testing.assert_frame_equal(players, expected_players(second),
+                                  check_like=True)
+
+
+def test_process_league_empty_directory(tmp_path):
+    assert PlayerData().process_league(str(tmp_path)).empty
+
+
+@pytest.mark.parametrize('ext', ['.json', '.json.zst'])
+def test_file_to_records_stream(tmp_path, ext):
+    file_path = str(tmp_path / f'player_stats_3{ext}')
+    dump_json({'players': make_fixtures()[3]}, file_path)
+
+    rows, idx = preprocess.file_to_records(file_path,
+                                           PlayerData()._player_row_dict)
+    rows_stream, idx_stream = preprocess.file_to_records(
+        file_path, PlayerData()._player_row_dict, stream=True
+    )
+
+    assert idx_stream == idx
+    assert rows_stream == rows
+
+
+def test_process_league_cache(tmp_path, monkeypatch):
+    fixtures = make_fixtures()
+    league_path = str(tmp_path / 'league')
+    cache_path = str(tmp_path / 'league.parquet')
+    write_player_stats(league_path, fixtures)
+
+    # Cache built with other features is ignored, and rebuilt
+    shots = PlayerData(struct_features=['shots']).process_league(
+        league_path, cache_path=cache_path
+    )
+    assert [x for x in shots if '.' in x] == ['shots.total', 'shots.on']
+    players = PlayerData().process_league(league_path, cache_path=cache_path)
+    pd.testing.assert_frame_equal(players, expected_players(fixtures),
+                                  check_like=True)
+
+    # Cache built with the same features is read back, with the same types,
+    # without reading the directory
+    def no_files(json_path):
+        raise AssertionError('cache not used')
+
+    monkeypatch.setattr(preprocess, 'list_json_files', no_files)
+    cached = PlayerData().process_league(league_path, cache_path=cache_path)
+    pd.testing.assert_frame_equal(cached, players)
+
+
+def test_read_cache_key(tmp_path):
+    source_path = str(tmp_path / 'source.json')
+    cache_path = str(tmp_path / 'cache.parquet')
+    dump_json({'players': []}, source_path)
+    df = pd.DataFrame({'a': [1., 2.]}, index=['x', 'y'])
+
+    preprocess.write_cache(df, cache_path, cache_key='key')
+
+    pd.testing.assert_frame_equal(
+        preprocess.read_cache(cache_path, source_path, 'key'), df
+    )
+    assert preprocess.read_cache(cache_path, source_path, 'other') is None
+    assert preprocess.read_cache(cache_path, source_path) is None
+
+
+def test_process_fixture_cache(tmp_path):
+    players = make_fixtures()[3]
+    file_path = str(tmp_path / 'player_stats_3.json')
+    dump_json({'players': players}, file_path)
+    expected = expected_players({3: players})
+    for x in ['player_name', 'team_name', 'position']:
+        expected[x] = expected[x].astype(object)
+
+    # No sidecar cache by default
+    fixture = PlayerData().process_fixture(file_path)
+    assert not os.path.exists(file_path + '.parquet')
+    pd.testing.assert_frame_equal(fixture, expected, check_like=True,
+                                  check_dtype=False)
+
+    # Sidecar cache of other features is not used
+    PlayerData(struct_features=['shots']).process_fixture(file_path,
+                                                          use_cache=True)
+    assert os.path.exists(file_path + '.parquet')
+    fixture = PlayerData().process_fixture(file_path, use_cache=True)
+    pd.testing.assert_frame_equal(fixture, expected, check_like=True,
+                                  check_dtype=False)
+
+
+def test_process_fixtures(tmp_path):
+    fixtures_path = tmp_path / 'fixture_stats'
+    os.makedirs(fixtures_path)
+    fixture_ids = [11, 12, 13]
+    for fixture_id in fixture_ids:
+        ext = '.json.zst' if fixture_id % 2 else '.json'
+        dump_json({'statistics': make_fixture_stats(fixture_id)},
+                  str(fixtures_path / f'fixture_stats_{fixture_id}{ext}'))
+
+    fixtures = LeagueData().process_fixtures(str(fixtures_path))
+
+    expected = pd.DataFrame(
+        [{f"{side}.{feat.replace(' ', '_')}": to_float(value[side])
+          for side in ['home', 'away']
+          for feat, value in make_fixture_stats(fixture_id).items()
+          if feat != 'fixture_id'}
+         for fixture_id in fixture_ids],
+        index=fixture_ids
+    ).astype(float)
+    pd.testing.assert_frame_equal(fixtures, expected, check_like=True)
+
+
+def test_process_league_fixtures(tmp_path):
+    fixture_list = [make_league_fixture(fixture_id) for fixture_id in range(6)]
+    # Files downloaded by get_data are compressed
+    league_file = str(tmp_path / 'fixtures_891.json')
+    dump_json({'fixtures': fixture_list}, league_file + '.zst')
+
+    league = LeagueData().process_league(league_file)
+
+    teams = pd.CategoricalDtype(['Inter', 'Milan', 'Roma'])
+    expected = pd.DataFrame({
+        'elapsed': [x['elapsed'] for x in fixture_list],
+        'goalsHomeTeam': [x['goalsHomeTeam'] for x in fixture_list],
+        'goalsAwayTeam': [x['goalsAwayTeam'] for x in fixture_list],
+        'league_name': pd.Categorical([x['league']['name']
+                                       for x in fixture_list]),
+        'league_country': pd.Categorical([x['league']['country']
+                                          for x in fixture_list]),
+        'fixture_date': pd.to_datetime([x['event_timestamp']
+                                        for x in fixture_list], unit='s'),
+        'homeTeam.id': [x['homeTeam']['team_id'] for x in fixture_list],
+        'homeTeam.name': pd.Categorical([x['homeTeam']['team_name']
+                                         for x in fixture_list],
+                                        dtype=teams),
+        'awayTeam.id': [x['awayTeam']['team_id'] for x in fixture_list],
+        'awayTeam.name': pd.Categorical([x['awayTeam']['team_name']
+                                         for x in fixture_list],
+                                        dtype=teams),
+        'score.halftime': [x['score']['halftime'] for x in fixture_list],
+        'score.fulltime': [x['score']['fulltime'] for x in fixture_list],
+    }, index=[f"891_{x['fixture_id']}" for x in fixture_list])
+    pd.testing.assert_frame_equal(league, expected, check_like=True)
+
+    # Home and away teams can be compared
+    assert not (league['homeTeam.name'] == league['awayTeam.name']).any()
+
+
+def test_process_league_no_fixtures(tmp_path):
+    league_file = str(tmp_path / 'fixtures_891.json')
+    dump_json({'fixtures': []}, league_file)
+
+    assert LeagueData().process_league(league_file).empty
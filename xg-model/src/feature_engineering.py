@@ -1,4 +1,5 @@
 import numpy as np
+from numba import njit, prange
 from sklearn.base import BaseEstimator, TransformerMixin
 
 
@@ -30,19 +31,101 @@ def isInside(x1, y1, x2, y2, x3, y3, x, y):
         return False
 
 
+@njit(parallel=True, fastmath=True)
+def _count_in_goal_cone(x_shot, y_shot, offsets, xs, ys, is_opponent,
+                        is_opponent_gk, x2, y2, x3, y3):
+    """
+    For each shot, count the players inside the triangle with vertices the
+    shot and the two goal posts ((x2, y2), (x3, y3)), and find the nearest
+    opponent among them. Same test as isInside, done in a single pass over all
+    the players of all the shots.
+    Parameters
+    ----------
+    x_shot, y_shot: numpy.ndarray
+        Coordinates of the shots
+    offsets: numpy.ndarray
+        Players of shot i are at positions offsets[i]:offsets[i + 1] of the
+        players arrays
+    xs, ys: numpy.ndarray
+        Coordinates of the players
+    is_opponent, is_opponent_gk: numpy.ndarray
+        True if the player is an opponent of the shooter / is the opponent
+        goalkeeper
+    x2, y2, x3, y3: float
+        Goal posts
+
+    Returns
+    -------
+    players, opponents, goalkeepers: numpy.ndarray
+        Number of players, opponents and opponent goalkeepers in goal cone
+    nearest_d2: numpy.ndarray
+        Squared distance of the nearest opponent in goal cone; meaningful only
+        if opponents > 0
+    """
+
+    n_shots = x_shot.shape[0]
+    players = np.zeros(n_shots, dtype=np.int64)
+    opponents = np.zeros(n_shots, dtype=np.int64)
+    goalkeepers = np.zeros(n_shots, dtype=np.int64)
+    nearest_d2 = np.zeros(n_shots, dtype=xs.dtype)
+    # Terms depending only on the goal posts
+    dy23 = y2 - y3
+    dx32 = x3 - x2
+    # 1 in the dtype of the inputs, so that the inverse is not upcast
+    one = np.ones(1, dtype=xs.dtype)[0]
+
+    for i in prange(n_shots):
+        x1 = x_shot[i]
+        y1 = y_shot[i]
+        det = dy23 * (x1 - x3) + dx32 * (y1 - y3)
+        # Shot on the goal line - there is no cone
+        if det == 0:
+            continue
+        # One division per shot, multiplications for each player
+        inv_det = one / det
+        dy31 = y3 - y1
+        dx13 = x1 - x3
+        for p in range(offsets[i], offsets[i + 1]):
+            a = (dy23 * (xs[p] - x3) + dx32 * (ys[p] - y3)) * inv_det
+            b = (dy31 * (xs[p] - x3) + dx13 * (ys[p] - y3)) * inv_det
+            # c = 1 - a - b is in [0, 1] if a + b is in [0, 1]; this keeps
+            # all the math in the dtype of the inputs
+            if (0 <= a <= 1) and (0 <= b <= 1) and (0 <= a + b <= 1):
+                players[i] += 1
+                if is_opponent[p]:
+                    opponents[i] += 1
+                    goalkeepers[i] += is_opponent_gk[p]
+                    dx = xs[p] - x1
+                    dy = ys[p] - y1
+                    d2 = dx * dx + dy * dy
+                    if opponents[i] == 1 or d2 < nearest_d2[i]:
+                        nearest_d2[i] = d2
+
+    return players, opponents, goalkeepers, nearest_d2
+
+
 class XGFeatEng(BaseEstimator, TransformerMixin):
 
     def __init__(self):
 
-        self.pitch_dim = (105, 65)
-        self.goal_dim = 7.32
+        # Geometry is computed in float32, that is precise enough for pitch
+        # coordinates and halves the memory traffic
+        self.pitch_dim = np.array((105, 65), dtype=np.float32)
+        self.goal_dim = np.float32(7.32)
+        # Goal posts, vertices of the goal cone of every shot
+        self._left_post = (self.pitch_dim[0],
+                           np.float32((self.pitch_dim[1] - self.goal_dim) / 2))
+        self._right_post = (self.pitch_dim[0],
+                            np.float32((self.pitch_dim[1] + self.goal_dim) / 2))
 
     def _normalize_x(self, x):
 
-        return x * self.pitch_dim[0] / 120
+        return np.asarray(x, dtype=np.float32) * (self.pitch_dim[0] /
+                                                  np.float32(120))
 
     def _normalize_y(self, y):
-        return y * self.pitch_dim[1] / 80
+        return np.asarray(y, dtype=np.float32) * (self.pitch_dim[1] /
+                                                  np.float32(80))
 
     def _calculate_angle(self, x, y):
         """
@@ -66,30 +149,48 @@ class XGFeatEng(BaseEstimator, TransformerMixin):
 
         return np.sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2)
 
-    def _check_if_in_goal_cone(self, players_list, x_shot, y_shot):
+    def _flatten_freeze_frames(self, freeze_frames):
         """
-        Check if player is in goal cone in respect of the shot taken at
-        (x_shot, y_shot), for each player in players_list; return list of
-        players in cone
+        Flatten the freeze frames of all the shots, in a single pass, into
+        arrays with one item per player; players of shot i are at positions
+        offsets[i]:offsets[i + 1]. Shots without freeze frame (None or NaN)
+        have no players; any other freeze frame is a sequence of players, e.g.
+        a list or, after a feather round-trip, a numpy array
         """
-        return [
-            player for player in players_list
-            if isInside(
-                x_shot, y_shot,
-                # Left goal post
-                self.pitch_dim[0], ((self.pitch_dim[1] - self.goal_dim) / 2),
-                # Right goal post
-                self.pitch_dim[0], ((self.pitch_dim[1] + self.goal_dim) / 2),
-                self._normalize_x(player['location'][0]),
-                self._normalize_y(player['location'][1])
-            ) == 1
-        ]
+
+        has_freeze_frame = []
+        offsets = [0]
+        xs, ys, teammate, is_gk = [], [], [], []
+        for freeze_frame in freeze_frames:
+            has_freeze_frame.append(
+                freeze_frame is not None and
+                not (isinstance(freeze_frame, float) and np.isnan(freeze_frame))
+            )
+            if has_freeze_frame[-1]:
+                for player in freeze_frame:
+                    location = player['location']
+                    xs.append(location[0])
+                    ys.append(location[1])
+                    teammate.append(player['teammate'])
+                    is_gk.append(player['position']['name'] == 'Goalkeeper')
+            offsets.append(len(xs))
+
+        # Coordinates are transformed to meters all at once
+        return (np.array(has_freeze_frame, dtype=np.bool_),
+                np.array(offsets, dtype=np.int64),
+                self._normalize_x(np.array(xs, dtype=np.float32)),
+                self._normalize_y(np.array(ys, dtype=np.float32)),
+                np.array(teammate, dtype=np.bool_),
+                np.array(is_gk, dtype=np.bool_))
 
     def fit(self, X):
         return self
 
     def transform(self, X):
-        df = X.copy()
+        # Output starts from the input without the unused features, that are
+        # read from X: the kept columns are copied once and X is not modified
+        df = X.drop(columns=['freeze_frame', 'key_pass', 'pass_height',
+                             'x_pass_received', 'y_pass_received'])
 
         # Transform coordinates to meters
         df['x_shot'] = self._normalize_x(df['x_shot'])
@@ -107,69 +208,51 @@ class XGFeatEng(BaseEstimator, TransformerMixin):
         df['angle'] = self._calculate_angle(df['x_shot'], df['y_center'])
 
         # Check if shot is after key pass
-        df['has_key_pass'] = 1
-        df.loc[df['key_pass'].isnull(), 'has_key_pass'] = 0
+        df['has_key_pass'] = X['key_pass'].notna().to_numpy(dtype=np.int8)
 
         # Calculate distance from point where the ball is controlled to shot
         df['distance_before_shot'] = self._calcuate_distance(
             (df['x_shot'], df['y_shot']),
-            (df['x_pass_received'], df['y_pass_received'])
+            (X['x_pass_received'], X['y_pass_received'])
         )
 
         # Check if receiving pass is high
-        df['is_high_pass'] = 0
-        df.loc[df['pass_height'] == 'High Pass', 'is_high_pass'] = 1
+        df['is_high_pass'] = (
+            X['pass_height'].to_numpy() == 'High Pass'
+        ).astype(np.int8)
 
         # Working on freeze frame
-        # Number of players into the "goal cone"
-        df['players_between'] = df.apply(
-            lambda x: len(
-                self._check_if_in_goal_cone(x['freeze_frame'], x['x_shot'],
-                                            x['y_shot'])
-            )
-            if x['freeze_frame'] is not None else None, 1
+        # Flatten all the freeze frames, then count players into the
+        # "goal cone" of each shot in a single pass
+        (has_freeze_frame, offsets,
+         xs, ys, teammate, is_gk) = self._flatten_freeze_frames(
+            X['freeze_frame']
         )
+        is_opponent = ~teammate
+        is_opponent_gk = is_opponent & is_gk
+        players, opponents, goalkeepers, nearest_d2 = _count_in_goal_cone(
+            df['x_shot'].to_numpy(dtype=np.float32),
+            df['y_shot'].to_numpy(dtype=np.float32),
+            offsets, xs, ys, is_opponent, is_opponent_gk,
+            *self._left_post,
+            *self._right_post
+        )
+
+        # Number of players into the "goal cone"
+        df['players_between'] = np.where(has_freeze_frame, players, np.nan)
 
         # Number of opponents
-        df['opponents_between'] = df.apply(
-            lambda x: len(
-                self._check_if_in_goal_cone(
-                    [i for i in x['freeze_frame'] if not i['teammate']],
-                    x['x_shot'], x['y_shot']
-                )
-            )
-            if x['freeze_frame'] is not None else None, 1
-        )
+        df['opponents_between'] = np.where(has_freeze_frame, opponents,
+                                           np.nan)
 
         # Is goalkeeper in goal cone
-        df['is_there_goalkeeper'] = df.apply(
-            lambda x: 1 if len(
-                self._check_if_in_goal_cone(
-                    [i for i in x['freeze_frame'] if not i['teammate']
-                     and i['position']['name'] == 'Goalkeeper'],
-                    x['x_shot'], x['y_shot']
-                )
-            ) > 0 or x['freeze_frame'] is None else 0, 1
-        )
+        df['is_there_goalkeeper'] = (
+            ~has_freeze_frame | (goalkeepers > 0)
+        ).astype(np.int8)
 
         # Distance to nearest opponent
-        # Select only opponents in the goal cone
-        df['nearest_opponent'] = df.apply(
-            lambda x: np.min([
-                self._calcuate_distance(
-                    (df['x_shot'], df['y_shot']),
-                    (self._normalize_x(p['location'][0]),
-                     self._normalize_y(p['location'][1]))
-                )
-                for p in self._check_if_in_goal_cone(
-                    [i for i in x['freeze_frame'] if not i['teammate']],
-                    x['x_shot'], x['y_shot']
-                )
-            ])
-            if x['freeze_frame'] is not None and x['opponents_between'] > 0
-            else None, 1
-        )
+        # Only opponents in the goal cone are considered
+        df['nearest_opponent'] = np.where(opponents > 0, np.sqrt(nearest_d2),
+                                          np.nan)
 
-        # Drop unused features
-        return df.drop(['freeze_frame', 'key_pass', 'pass_height',
-                        'x_pass_received', 'y_pass_received'], 1)
+        return df
@@ -0,0 +1,99 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.feature_engineering import XGFeatEng, isInside
+
+
+def make_shots(n_shots=200, seed=0):
+    """
+    Synthetic shots in StatsBomb coordinates, some without freeze frame
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n_shots):
+        freeze_frame = None if i % 17 == 0 else [
+            {'location': [rng.uniform(60, 120), rng.uniform(0, 80)],
+             'teammate': bool(rng.integers(2)),
+             'position': {'name': 'Goalkeeper' if j == 0 else 'Defender'}}
+            for j in range(rng.integers(0, 12))
+        ]
+        rows.append({'x_shot': rng.uniform(80, 119),
+                     'y_shot': rng.uniform(10, 70),
+                     'freeze_frame': freeze_frame,
+                     'key_pass': None if i % 3 else 'key',
+                     'pass_height': 'High Pass' if i % 4 else 'Ground Pass',
+                     'x_pass_received': rng.uniform(80, 119),
+                     'y_pass_received': rng.uniform(10, 70)})
+
+    return pd.DataFrame(rows)
+
+
+def check_goal_cone(X, out):
+    """
+    Compare the goal cone features with the plain Python isInside test
+    """
+
+    fe = XGFeatEng()
+    length, width = (float(x) for x in fe.pitch_dim)
+    goal = float(fe.goal_dim)
+    for i, shot in X.iterrows():
+        row = out.loc[i]
+        if shot['freeze_frame'] is None:
+            assert np.isnan(row['players_between'])
+            assert np.isnan(row['opponents_between'])
+            assert np.isnan(row['nearest_opponent'])
+            assert row['is_there_goalkeeper'] == 1
+            continue
+
+        x1 = shot['x_shot'] * length / 120
+        y1 = shot['y_shot'] * width / 80
+        inside = []
+        for player in shot['freeze_frame']:
+            x = player['location'][0] * length / 120
+            y = player['location'][1] * width / 80
+            if isInside(x1, y1, length, (width - goal) / 2,
+                        length, (width + goal) / 2, x, y):
+                inside.append((player, np.hypot(x - x1, y - y1)))
+        opponents = [(p, d) for p, d in inside if not p['teammate']]
+
+        assert row['players_between'] == len(inside)
+        assert row['opponents_between'] == len(opponents)
+        assert row['is_there_goalkeeper'] == int(any(
+            p['position']['name'] == 'Goalkeeper' for p, _ in opponents
+        ))
+        if opponents:
+            assert row['nearest_opponent'] == pytest.approx(
+                min(d for _, d in opponents), abs=1e-3
+            )
+        else:
+            assert np.isnan(row['nearest_opponent'])
+
+
+def test_transform_matches_isinside():
+    X = make_shots()
+    X_orig = X.copy()
+    out = XGFeatEng().fit_transform(X)
+
+    pd.testing.assert_frame_equal(X, X_orig)
+    check_goal_cone(X, out)
+
+
+def test_transform_after_feather_round_trip(tmp_path):
+    # After read_feather the freeze frames are numpy arrays instead of lists
+    feather_path = tmp_path / 'shots.feather'
+    make_shots().to_feather(feather_path)
+    X = pd.read_feather(feather_path)
+    assert isinstance(X['freeze_frame'].dropna().iloc[0], np.ndarray)
+
+    out = XGFeatEng().fit_transform(X)
+
+    assert out['players_between'].notna().sum() == \
+        X['freeze_frame'].notna().sum()
+    check_goal_cone(X, out)